@@ -10,6 +10,9 @@ import shutil
 import sqlite3
 import subprocess
 import sys
+import time
+import zipfile
+import zlib
 import click
 
 # CoreData epoch offset (seconds between 1970-01-01 and 2001-01-01)
@@ -19,6 +22,16 @@ DB_PATH = os.path.expanduser(
     "~/Library/Group Containers/group.com.apple.notes/NoteStore.sqlite"
 )
 
+# Derived data (MinHash signatures, etc.) lives outside the read-only NoteStore
+CACHE_DIR = os.path.expanduser("~/.cache/apple-notes-cli")
+
+# MinHash parameters. Changing any of these invalidates persisted signatures.
+MINHASH_NUM_PERM = 128
+MINHASH_SHINGLE_WORDS = 3
+MINHASH_SEED = 1
+MINHASH_PRIME = (1 << 31) - 1  # keeps a * x + b inside uint64
+MINHASH_BATCH_SHINGLES = 50_000  # shingles hashed per NumPy batch
+
 
 def error_exit(msg, code=1):
     """Print JSON error to stderr and exit."""
@@ -63,62 +76,447 @@ def _read_varint(buf, pos):
     return value, pos
 
 
-def extract_text_from_protobuf(data):
-    """Extract readable text from a gzipped protobuf blob.
+# Paragraph style_type values used by Notes.app (ParagraphStyle.style_type)
+STYLE_TITLE = 0
+STYLE_HEADING = 1
+STYLE_SUBHEADING = 2
+STYLE_MONOSPACED = 4
+STYLE_DOTTED_LIST = 100
+STYLE_DASHED_LIST = 101
+STYLE_NUMBERED_LIST = 102
+STYLE_CHECKLIST = 103
 
-    Apple Notes stores the note body as a gzipped protobuf (CRDT merge format).
-    The text content is typically at: root → field 2 → field 3 → field 2 (the
-    longest UTF-8 string). We recursively scan all length-delimited fields and
-    return the longest printable text found.
+# AttributeRun.font_weight values
+FONT_BOLD = 1
+FONT_ITALIC = 2
+FONT_BOLD_ITALIC = 3
+
+ATTACHMENT_CHAR = "\ufffc"
+
+
+def _iter_fields(buf):
+    """Yield (field_number, wire_type, value) for each field of a protobuf message.
+
+    Varints are returned as signed 64-bit ints, length-delimited fields as
+    bytes. Nested messages are not descended into; callers decode only the
+    fields they need.
     """
+    i = 0
+    while i < len(buf):
+        tag, i = _read_varint(buf, i)
+        wire_type = tag & 0x07
+        if wire_type == 0:  # varint
+            value, i = _read_varint(buf, i)
+            if value >= 1 << 63:
+                value -= 1 << 64
+        elif wire_type == 1:  # 64-bit
+            value, i = buf[i : i + 8], i + 8
+        elif wire_type == 5:  # 32-bit
+            value, i = buf[i : i + 4], i + 4
+        elif wire_type == 2:  # length-delimited
+            length, i = _read_varint(buf, i)
+            if i + length > len(buf):
+                return
+            value, i = buf[i : i + length], i + length
+        else:
+            return
+        yield tag >> 3, wire_type, value
+
+
+def _first_field(buf, number):
+    """Return the first length-delimited value of field `number`, or None."""
+    for field, wire_type, value in _iter_fields(buf):
+        if field == number and wire_type == 2:
+            return value
+    return None
+
+
+def _scan_strings(buf):
+    """Recursively scan protobuf for UTF-8 strings."""
+    found = []
+    for _, wire_type, chunk in _iter_fields(buf):
+        if wire_type != 2:
+            continue
+        # Try as UTF-8 text
+        try:
+            text = chunk.decode("utf-8")
+            printable = sum(1 for c in text if c.isprintable() or c in "\n\r\t")
+            if len(text) > 0 and printable / len(text) > 0.9:
+                found.append(text)
+        except UnicodeDecodeError:
+            pass
+        # Also recurse into sub-messages
+        if len(chunk) > 2:
+            found.extend(_scan_strings(chunk))
+    return found
+
+
+def _format_uuid(raw):
+    """Format 16 raw bytes as a UUID string (hex for anything else)."""
+    if len(raw) != 16:
+        return raw.hex()
+    h = raw.hex().upper()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _decode_attribute_run(buf):
+    """Decode an AttributeRun message (see notestore.proto) into a dict."""
+    run = {
+        "length": 0,
+        "style_type": None,
+        "indent": 0,
+        "block_quote": False,
+        "checklist": None,
+        "font_weight": 0,
+        "underlined": False,
+        "strikethrough": False,
+        "link": None,
+        "attachment": None,
+    }
+    for field, wire_type, value in _iter_fields(buf):
+        if field == 1 and wire_type == 0:
+            run["length"] = value
+        elif field == 2 and wire_type == 2:  # ParagraphStyle
+            for pfield, pwire, pvalue in _iter_fields(value):
+                if pfield == 1 and pwire == 0 and pvalue != -1:
+                    run["style_type"] = pvalue
+                elif pfield == 4 and pwire == 0:
+                    run["indent"] = pvalue
+                elif pfield == 8 and pwire == 0:
+                    run["block_quote"] = bool(pvalue)
+                elif pfield == 5 and pwire == 2:  # Checklist
+                    checklist = {"uuid": None, "done": False}
+                    for cfield, cwire, cvalue in _iter_fields(pvalue):
+                        if cfield == 1 and cwire == 2:
+                            checklist["uuid"] = _format_uuid(cvalue)
+                        elif cfield == 2 and cwire == 0:
+                            checklist["done"] = bool(cvalue)
+                    run["checklist"] = checklist
+        elif field == 5 and wire_type == 0:
+            run["font_weight"] = value
+        elif field == 6 and wire_type == 0:
+            run["underlined"] = bool(value)
+        elif field == 7 and wire_type == 0:
+            run["strikethrough"] = bool(value)
+        elif field == 9 and wire_type == 2:
+            run["link"] = value.decode("utf-8", "replace")
+        elif field == 12 and wire_type == 2:  # AttachmentInfo
+            attachment = {"uuid": None, "type_uti": None}
+            for afield, awire, avalue in _iter_fields(value):
+                if afield == 1 and awire == 2:
+                    attachment["uuid"] = avalue.decode("utf-8", "replace")
+                elif afield == 2 and awire == 2:
+                    attachment["type_uti"] = avalue.decode("utf-8", "replace")
+            run["attachment"] = attachment
+    return run
+
+
+def _decompress(data):
+    """Gunzip a note blob, or None if it is missing or not gzip."""
     if data is None:
-        return ""
+        return None
     try:
-        decompressed = gzip.decompress(data)
+        return gzip.decompress(data)
     except Exception:
-        return ""
+        return None
 
-    def scan_strings(buf):
-        """Recursively scan protobuf for UTF-8 strings."""
-        found = []
-        i = 0
-        while i < len(buf):
-            if i >= len(buf):
-                break
-            tag, i = _read_varint(buf, i)
-            wire_type = tag & 0x07
-            if wire_type == 0:  # varint
-                _, i = _read_varint(buf, i)
-            elif wire_type == 1:  # 64-bit
-                i += 8
-            elif wire_type == 5:  # 32-bit
-                i += 4
-            elif wire_type == 2:  # length-delimited
-                length, i = _read_varint(buf, i)
-                if length < 0 or i + length > len(buf):
-                    break
-                chunk = buf[i : i + length]
-                i += length
-                # Try as UTF-8 text
-                try:
-                    text = chunk.decode("utf-8")
-                    printable = sum(1 for c in text if c.isprintable() or c in "\n\r\t")
-                    if len(text) > 0 and printable / len(text) > 0.9:
-                        found.append(text)
-                except UnicodeDecodeError:
-                    pass
-                # Also recurse into sub-messages
-                if len(chunk) > 2:
-                    found.extend(scan_strings(chunk))
-            else:
-                break
-        return found
 
-    strings = scan_strings(decompressed)
-    if not strings:
-        return ""
+def _note_message(decompressed):
+    """Return the Note message (NoteStoreProto → document → note), or None."""
+    document = _first_field(decompressed, 2)
+    return _first_field(document, 3) if document is not None else None
+
+
+def _longest_string(decompressed):
+    """Fallback for blobs without the expected shape: the longest printable string."""
+    strings = _scan_strings(decompressed)
     # The note body text is the longest string found
-    return max(strings, key=len)
+    return max(strings, key=len) if strings else ""
+
+
+def decode_note(data):
+    """Decode a gzipped note blob into its text and attribute runs in one pass.
+
+    Follows NoteStoreProto → document (2) → note (3) from notestore.proto,
+    reading note_text (2) and each attribute_run (5). Every run gets its
+    slice of the text under "text"; run lengths count UTF-16 code units, as
+    in NSString. If the blob doesn't have that shape, falls back to the
+    longest printable string anywhere in it, with no runs.
+
+    Returns {"text": str, "runs": [run dict, ...]}.
+    """
+    decompressed = _decompress(data)
+    if decompressed is None:
+        return {"text": "", "runs": []}
+
+    note = _note_message(decompressed)
+    text_bytes, run_bufs = None, []
+    if note is not None:
+        for field, wire_type, value in _iter_fields(note):
+            if field == 2 and wire_type == 2 and text_bytes is None:
+                text_bytes = value
+            elif field == 5 and wire_type == 2:
+                run_bufs.append(value)
+
+    if text_bytes is None:
+        return {"text": _longest_string(decompressed), "runs": []}
+
+    text = text_bytes.decode("utf-8", "replace")
+    utf16 = text.encode("utf-16-le")
+    runs = []
+    pos = 0
+    for buf in run_bufs:
+        run = _decode_attribute_run(buf)
+        run["text"] = utf16[pos * 2 : (pos + run["length"]) * 2].decode("utf-16-le", "replace")
+        pos += run["length"]
+        runs.append(run)
+    # Text not covered by any run keeps default formatting
+    if pos * 2 < len(utf16):
+        tail = _decode_attribute_run(b"")
+        tail["text"] = utf16[pos * 2 :].decode("utf-16-le", "replace")
+        tail["length"] = len(utf16) // 2 - pos
+        runs.append(tail)
+    return {"text": text, "runs": runs}
+
+
+def extract_text_from_protobuf(data):
+    """Extract readable text from a gzipped protobuf blob.
+
+    Apple Notes stores the note body as a gzipped protobuf (CRDT merge format).
+    The text lives at root → field 2 → field 3 → field 2. Unlike decode_note,
+    this stops at note_text and never decodes the attribute runs, which is
+    all search, duplicates and stats need.
+    """
+    decompressed = _decompress(data)
+    if decompressed is None:
+        return ""
+    note = _note_message(decompressed)
+    if note is not None:
+        for field, wire_type, value in _iter_fields(note):
+            if field == 2 and wire_type == 2:
+                return value.decode("utf-8", "replace")
+    return _longest_string(decompressed)
+
+
+def note_paragraphs(runs):
+    """Split decoded runs into paragraphs.
+
+    Paragraph-level attributes (style, indent, checklist) are taken from the
+    run that ends the paragraph, since Notes applies them to the newline.
+    Each paragraph is {"runs": [...], "style_type", "indent", "block_quote",
+    "checklist"} where runs are the inline pieces without the newline.
+    """
+    paragraphs = []
+    pieces = []
+    for run in runs:
+        parts = run["text"].split("\n")
+        for i, part in enumerate(parts):
+            if part:
+                pieces.append(dict(run, text=part))
+            if i < len(parts) - 1:
+                paragraphs.append({
+                    "runs": pieces,
+                    "style_type": run["style_type"],
+                    "indent": run["indent"],
+                    "block_quote": run["block_quote"],
+                    "checklist": run["checklist"],
+                })
+                pieces = []
+    if pieces:
+        last = pieces[-1]
+        paragraphs.append({
+            "runs": pieces,
+            "style_type": last["style_type"],
+            "indent": last["indent"],
+            "block_quote": last["block_quote"],
+            "checklist": last["checklist"],
+        })
+    return paragraphs
+
+
+def note_checklists(paragraphs):
+    """Return checklist items ({uuid, text, done, indent}) from paragraphs."""
+    items = []
+    for para in paragraphs:
+        checklist = para["checklist"]
+        if checklist is None:
+            continue
+        items.append({
+            "uuid": checklist["uuid"],
+            "text": "".join(run["text"] for run in para["runs"]),
+            "done": checklist["done"],
+            "indent": para["indent"],
+        })
+    return items
+
+
+def _attachment_label(attachment):
+    """Placeholder text for an inline attachment."""
+    return f"[Attachment: {attachment['type_uti'] or 'unknown'} ({attachment['uuid'] or ''})]"
+
+
+def paragraphs_to_markdown(paragraphs):
+    """Render decoded paragraphs as Markdown."""
+    lines = []
+    in_code = False
+    for para in paragraphs:
+        style = para["style_type"]
+        if style == STYLE_MONOSPACED:
+            if not in_code:
+                lines.append("```")
+                in_code = True
+            lines.append("".join(run["text"] for run in para["runs"]))
+            continue
+        if in_code:
+            lines.append("```")
+            in_code = False
+
+        content = ""
+        for run in para["runs"]:
+            if run["attachment"]:
+                content += _attachment_label(run["attachment"])
+                continue
+            chunk = run["text"].replace(ATTACHMENT_CHAR, "")
+            stripped = chunk.strip()
+            if stripped:
+                lead = chunk[: len(chunk) - len(chunk.lstrip())]
+                trail = chunk[len(chunk.rstrip()) :]
+                if run["font_weight"] in (FONT_BOLD, FONT_BOLD_ITALIC):
+                    stripped = f"**{stripped}**"
+                if run["font_weight"] in (FONT_ITALIC, FONT_BOLD_ITALIC):
+                    stripped = f"*{stripped}*"
+                if run["strikethrough"]:
+                    stripped = f"~~{stripped}~~"
+                if run["link"]:
+                    stripped = f"[{stripped}]({run['link']})"
+                chunk = lead + stripped + trail
+            content += chunk
+
+        indent = "  " * para["indent"]
+        if para["checklist"] is not None:
+            content = f"{indent}- [{'x' if para['checklist']['done'] else ' '}] {content}"
+        elif style in (STYLE_DOTTED_LIST, STYLE_DASHED_LIST):
+            content = f"{indent}- {content}"
+        elif style == STYLE_NUMBERED_LIST:
+            content = f"{indent}1. {content}"
+        elif style == STYLE_TITLE:
+            content = f"# {content}"
+        elif style == STYLE_HEADING:
+            content = f"## {content}"
+        elif style == STYLE_SUBHEADING:
+            content = f"### {content}"
+        if para["block_quote"]:
+            content = f"> {content}"
+        lines.append(content)
+    if in_code:
+        lines.append("```")
+    return "\n".join(lines)
+
+
+def _html_escape(text):
+    """Escape text for HTML element content and attribute values."""
+    return (
+        text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+    )
+
+
+def paragraphs_to_html(paragraphs):
+    """Render decoded paragraphs as HTML."""
+    list_tags = {
+        STYLE_DOTTED_LIST: "ul",
+        STYLE_DASHED_LIST: "ul",
+        STYLE_NUMBERED_LIST: "ol",
+        STYLE_CHECKLIST: "ul",
+    }
+    heading_tags = {STYLE_TITLE: "h1", STYLE_HEADING: "h2", STYLE_SUBHEADING: "h3"}
+    html = []
+    # One entry per indent level: [style, tag, index of its open <li> line or None].
+    # A nested list goes inside its parent's <li>, which stays open until a
+    # sibling item starts or the depth drops.
+    open_lists = []
+    in_code = False
+
+    def close_item(level):
+        if level[2] is not None:
+            if level[2] == len(html) - 1:
+                html[-1] += "</li>"
+            else:
+                html.append("</li>")
+            level[2] = None
+
+    def close_lists(depth):
+        while len(open_lists) > depth:
+            level = open_lists.pop()
+            close_item(level)
+            html.append(f"</{level[1]}>")
+
+    for para in paragraphs:
+        style = para["style_type"]
+        if para["checklist"] is not None:
+            style = STYLE_CHECKLIST
+
+        content = ""
+        for run in para["runs"]:
+            if run["attachment"]:
+                content += _html_escape(_attachment_label(run["attachment"]))
+                continue
+            chunk = _html_escape(run["text"].replace(ATTACHMENT_CHAR, ""))
+            if not chunk:
+                continue
+            if run["font_weight"] in (FONT_BOLD, FONT_BOLD_ITALIC):
+                chunk = f"<b>{chunk}</b>"
+            if run["font_weight"] in (FONT_ITALIC, FONT_BOLD_ITALIC):
+                chunk = f"<i>{chunk}</i>"
+            if run["underlined"]:
+                chunk = f"<u>{chunk}</u>"
+            if run["strikethrough"]:
+                chunk = f"<s>{chunk}</s>"
+            if run["link"]:
+                chunk = f'<a href="{_html_escape(run["link"])}">{chunk}</a>'
+            content += chunk
+
+        if style == STYLE_MONOSPACED:
+            if not in_code:
+                close_lists(0)
+                html.append("<pre><code>")
+                in_code = True
+            html.append(content)
+            continue
+        if in_code:
+            html.append("</code></pre>")
+            in_code = False
+
+        tag = list_tags.get(style)
+        depth = para["indent"] + 1 if tag else 0
+        close_lists(depth)
+        if open_lists and len(open_lists) == depth and open_lists[-1][0] != style:
+            close_lists(depth - 1)
+        if open_lists and len(open_lists) == depth:
+            close_item(open_lists[-1])
+        while len(open_lists) < depth:
+            if open_lists and open_lists[-1][2] is None:
+                # Indent jumped more than one level: nest under an empty item
+                html.append("<li>")
+                open_lists[-1][2] = len(html) - 1
+            html.append(f"<{tag}>")
+            open_lists.append([style, tag, None])
+
+        if tag:
+            if style == STYLE_CHECKLIST:
+                checked = " checked" if para["checklist"]["done"] else ""
+                content = f'<input type="checkbox"{checked} disabled> {content}'
+            html.append(f"<li>{content}")
+            open_lists[-1][2] = len(html) - 1
+        elif style in heading_tags:
+            html.append(f"<{heading_tags[style]}>{content}</{heading_tags[style]}>")
+        elif para["block_quote"]:
+            html.append(f"<blockquote>{content}</blockquote>")
+        elif content:
+            html.append(f"<p>{content}</p>")
+    if in_code:
+        html.append("</code></pre>")
+    close_lists(0)
+    return "\n".join(html)
 
 
 def is_uuid(identifier):
@@ -150,17 +548,15 @@ def resolve_note_id(db, identifier):
         error_exit(f"Note not found with ID: {identifier}")
 
 
-def get_note_body(db, note_pk):
-    """Get the text body of a note by its Z_PK."""
+def get_note_document(db, note_pk):
+    """Decode a note's body (text + attribute runs) by its Z_PK. See decode_note."""
     row = db.execute(
         """SELECT nd.ZDATA FROM ZICCLOUDSYNCINGOBJECT n
            JOIN ZICNOTEDATA nd ON nd.Z_PK = n.ZNOTEDATA
            WHERE n.Z_PK = ?""",
         (note_pk,),
     ).fetchone()
-    if row and row["ZDATA"]:
-        return extract_text_from_protobuf(row["ZDATA"])
-    return ""
+    return decode_note(row["ZDATA"] if row else None)
 
 
 def get_folder_name(db, folder_pk):
@@ -174,6 +570,282 @@ def get_folder_name(db, folder_pk):
     return row["ZTITLE2"] if row else None
 
 
+FOLDER_INDEX_SQL = """
+    WITH RECURSIVE
+    folder AS (
+        SELECT Z_PK, ZIDENTIFIER, ZTITLE2, ZPARENT
+        FROM ZICCLOUDSYNCINGOBJECT WHERE ZTITLE2 IS NOT NULL
+    ),
+    tree(Z_PK, path, depth) AS (
+        SELECT f.Z_PK, f.ZTITLE2, 0 FROM folder f
+        WHERE f.ZPARENT IS NULL OR f.ZPARENT NOT IN (SELECT Z_PK FROM folder)
+        UNION ALL
+        SELECT f.Z_PK, tree.path || '/' || f.ZTITLE2, tree.depth + 1
+        FROM folder f JOIN tree ON f.ZPARENT = tree.Z_PK
+        WHERE tree.depth < 64
+    ),
+    closure(ancestor, descendant, depth) AS (
+        SELECT Z_PK, Z_PK, 0 FROM folder
+        UNION ALL
+        SELECT closure.ancestor, f.Z_PK, closure.depth + 1
+        FROM folder f JOIN closure ON f.ZPARENT = closure.descendant
+        WHERE closure.depth < 64
+    ),
+    direct AS (
+        SELECT ZFOLDER, COUNT(*) AS note_count, MAX(ZMODIFICATIONDATE1) AS last_modified
+        FROM ZICCLOUDSYNCINGOBJECT
+        WHERE ZTITLE1 IS NOT NULL
+          AND (ZMARKEDFORDELETION = 0 OR ZMARKEDFORDELETION IS NULL)
+        GROUP BY ZFOLDER
+    ),
+    subtree AS (
+        SELECT closure.ancestor, SUM(direct.note_count) AS note_count,
+               MAX(direct.last_modified) AS last_modified
+        FROM closure JOIN direct ON direct.ZFOLDER = closure.descendant
+        GROUP BY closure.ancestor
+    )
+    SELECT f.Z_PK, f.ZIDENTIFIER, f.ZTITLE2, f.ZPARENT, tree.path, tree.depth,
+           COALESCE(direct.note_count, 0) AS note_count, direct.last_modified,
+           COALESCE(subtree.note_count, 0) AS total_note_count,
+           subtree.last_modified AS total_last_modified
+    FROM folder f
+    JOIN tree ON tree.Z_PK = f.Z_PK
+    LEFT JOIN direct ON direct.ZFOLDER = f.Z_PK
+    LEFT JOIN subtree ON subtree.ancestor = f.Z_PK
+    ORDER BY tree.path
+"""
+
+
+def db_fingerprint():
+    """Identify the current state of the NoteStore (database + WAL) on disk."""
+    fingerprint = []
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        try:
+            st = os.stat(path)
+            fingerprint.append([st.st_mtime_ns, st.st_size])
+        except OSError:
+            fingerprint.append(None)
+    return fingerprint
+
+
+def get_folder_index(db):
+    """Return the folder tree as {folder_pk: folder dict}.
+
+    Paths, depths and direct/recursive note counts come from a single
+    recursive-CTE query. The result is cached in CACHE_DIR and reused until
+    the NoteStore changes on disk.
+    """
+    path = os.path.join(CACHE_DIR, "folder-index.json")
+    fingerprint = db_fingerprint()
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if cached.get("fingerprint") == fingerprint:
+            return {folder["id"]: folder for folder in cached["folders"]}
+    except (OSError, ValueError, KeyError, AttributeError, TypeError):
+        pass  # Missing or malformed cache: rebuild it below
+
+    folders = []
+    for row in db.execute(FOLDER_INDEX_SQL):
+        folders.append({
+            "id": row["Z_PK"],
+            "uuid": row["ZIDENTIFIER"],
+            "name": row["ZTITLE2"],
+            "parent_id": row["ZPARENT"],
+            "path": row["path"],
+            "depth": row["depth"],
+            "note_count": row["note_count"],
+            "last_modified": coredata_to_iso(row["last_modified"]),
+            "total_note_count": row["total_note_count"],
+            "total_last_modified": coredata_to_iso(row["total_last_modified"]),
+        })
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"fingerprint": fingerprint, "folders": folders}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # The cache is an optimization; reads still work without it
+    return {folder["id"]: folder for folder in folders}
+
+
+def resolve_folder_filter(index, folder=None, folder_path=None, recursive=False):
+    """Resolve --folder / --folder-path to a set of folder Z_PKs.
+
+    Returns None when no folder filter was given. With recursive=True, all
+    descendant folders of the matches are included.
+    """
+    if folder is None and folder_path is None:
+        return None
+    if folder_path is not None:
+        wanted = "/".join(part for part in folder_path.split("/") if part)
+        matches = {pk for pk, f in index.items() if f["path"] == wanted}
+        if not matches:
+            error_exit(f"Folder not found: {folder_path}")
+    else:
+        matches = {pk for pk, f in index.items() if f["name"] == folder}
+    if folder is not None and folder_path is not None:
+        matches &= {pk for pk, f in index.items() if f["name"] == folder}
+
+    if recursive:
+        children = {}
+        for pk, f in index.items():
+            children.setdefault(f["parent_id"], []).append(pk)
+        stack = list(matches)
+        while stack:
+            for child in children.get(stack.pop(), []):
+                if child not in matches:
+                    matches.add(child)
+                    stack.append(child)
+    return matches
+
+
+def folder_clause(folder_pks):
+    """SQL fragment and params restricting n.ZFOLDER to folder_pks."""
+    if folder_pks is None:
+        return "", []
+    pks = sorted(folder_pks)
+    if not pks:
+        return " AND 0", []
+    return f" AND n.ZFOLDER IN ({','.join('?' * len(pks))})", pks
+
+
+def table_columns(db, table):
+    """Return the set of column names in table (schemas vary across macOS releases)."""
+    return {row["name"] for row in db.execute(f"PRAGMA table_info({table})")}
+
+
+def gzip_isize(magic, trailer):
+    """Uncompressed size recorded in a gzip trailer, or None if the blob isn't gzip.
+
+    Takes the blob's first two bytes and last four bytes, so callers can
+    fetch just those with substr() instead of the whole ZDATA.
+    """
+    if magic != b"\x1f\x8b" or trailer is None or len(trailer) != 4:
+        return None
+    return int.from_bytes(trailer, "little")
+
+
+def shingle_hashes(text, k=MINHASH_SHINGLE_WORDS):
+    """Return the set of CRC32 hashes of the word k-shingles in text."""
+    words = re.sub(r"\s+", " ", text.lower()).split()
+    if not words:
+        return set()
+    if len(words) < k:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i : i + k]).encode("utf-8"))
+        for i in range(len(words) - k + 1)
+    }
+
+
+def minhash_signatures(np, shingle_sets):
+    """Compute MinHash signatures for a list of shingle hash sets.
+
+    Shingles from many notes are concatenated and permuted together with
+    (a * x + b) mod p, then reduced per note with minimum.reduceat, so each
+    batch is a handful of array operations rather than a Python loop per
+    permutation. Returns a (len(shingle_sets), MINHASH_NUM_PERM) uint32 array.
+    Every set must be non-empty.
+    """
+    rng = np.random.default_rng(MINHASH_SEED)
+    a = rng.integers(1, MINHASH_PRIME, MINHASH_NUM_PERM, dtype=np.uint64)[:, None]
+    b = rng.integers(0, MINHASH_PRIME, MINHASH_NUM_PERM, dtype=np.uint64)[:, None]
+    prime = np.uint64(MINHASH_PRIME)
+
+    sigs = np.empty((len(shingle_sets), MINHASH_NUM_PERM), dtype=np.uint32)
+    start = 0
+    while start < len(shingle_sets):
+        # Grow the batch until it holds MINHASH_BATCH_SHINGLES (at least one note)
+        end, total = start, 0
+        while end < len(shingle_sets) and (end == start or total + len(shingle_sets[end]) <= MINHASH_BATCH_SHINGLES):
+            total += len(shingle_sets[end])
+            end += 1
+        batch = shingle_sets[start:end]
+        lengths = np.fromiter((len(s) for s in batch), dtype=np.int64, count=len(batch))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        x = np.fromiter(
+            (h for s in batch for h in s), dtype=np.uint64, count=int(lengths.sum())
+        ) % prime
+        permuted = (a * x[None, :] + b) % prime
+        sigs[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return sigs
+
+
+def lsh_bands(threshold, num_perm=MINHASH_NUM_PERM):
+    """Pick (bands, rows) so the LSH S-curve threshold sits at or below threshold.
+
+    Candidates are verified against the signatures afterwards, so lowering
+    the LSH threshold only costs extra comparisons while reducing false
+    negatives. It does not eliminate them: at the default 0.8 (16 bands of
+    8 rows), a pair at exactly 0.8 similarity becomes a candidate about 95%
+    of the time.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def signature_cache_path():
+    """Path of the persisted MinHash signature cache."""
+    return os.path.join(CACHE_DIR, "minhash-signatures.npz")
+
+
+def load_signature_cache(np):
+    """Load persisted signatures as {pk: (modified, signature)}.
+
+    Returns an empty dict if the cache is missing, unreadable, or was built
+    with different MinHash parameters.
+    """
+    path = signature_cache_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with np.load(path) as data:
+            params = tuple(int(v) for v in data["params"])
+            if params != (MINHASH_NUM_PERM, MINHASH_SHINGLE_WORDS, MINHASH_SEED, MINHASH_PRIME):
+                return {}
+            return {
+                int(pk): (float(mod), sig)
+                for pk, mod, sig in zip(data["pks"], data["modified"], data["sigs"])
+            }
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return {}
+
+
+def save_signature_cache(np, cache):
+    """Persist {pk: (modified, signature)} atomically."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    pks = sorted(cache)
+    sigs = (
+        np.stack([cache[pk][1] for pk in pks])
+        if pks
+        else np.empty((0, MINHASH_NUM_PERM), dtype=np.uint32)
+    )
+    path = signature_cache_path()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            params=np.array(
+                [MINHASH_NUM_PERM, MINHASH_SHINGLE_WORDS, MINHASH_SEED, MINHASH_PRIME],
+                dtype=np.int64,
+            ),
+            pks=np.array(pks, dtype=np.int64),
+            modified=np.array([cache[pk][0] for pk in pks], dtype=np.float64),
+            sigs=sigs,
+        )
+    os.replace(tmp, path)
+
+
 def run_applescript(script):
     """Run an AppleScript and return (success, output_or_error)."""
     result = subprocess.run(
@@ -248,13 +920,16 @@ def cli():
 
 @cli.command("list")
 @click.option("--folder", default=None, help="Filter by folder name")
+@click.option("--folder-path", default=None, help="Filter by folder path, e.g. Work/Projects")
+@click.option("--recursive", is_flag=True, help="Include notes in subfolders of the filtered folder")
 @click.option("--limit", default=None, type=int, help="Limit number of results")
 @click.option("--pinned", is_flag=True, help="Show pinned notes only")
 @click.option("--include-deleted", is_flag=True, help="Include deleted notes")
 @click.option("--human", is_flag=True, help="Human-readable table output")
-def list_notes(folder, limit, pinned, include_deleted, human):
+def list_notes(folder, folder_path, recursive, limit, pinned, include_deleted, human):
     """List all notes as JSON."""
     db = get_db()
+    index = get_folder_index(db)
     query = """
         SELECT n.Z_PK, n.ZIDENTIFIER, n.ZTITLE1, n.ZCREATIONDATE3,
                n.ZMODIFICATIONDATE1, n.ZFOLDER, n.ZISPINNED, n.ZMARKEDFORDELETION
@@ -269,11 +944,11 @@ def list_notes(folder, limit, pinned, include_deleted, human):
     if pinned:
         query += " AND n.ZISPINNED = 1"
 
-    if folder:
-        query += """ AND n.ZFOLDER IN (
-            SELECT Z_PK FROM ZICCLOUDSYNCINGOBJECT WHERE ZTITLE2 = ?
-        )"""
-        params.append(folder)
+    clause, folder_params = folder_clause(
+        resolve_folder_filter(index, folder, folder_path, recursive)
+    )
+    query += clause
+    params.extend(folder_params)
 
     query += " ORDER BY n.ZMODIFICATIONDATE1 DESC"
 
@@ -285,11 +960,13 @@ def list_notes(folder, limit, pinned, include_deleted, human):
 
     notes = []
     for row in rows:
+        folder_info = index.get(row["ZFOLDER"], {})
         notes.append({
             "id": row["Z_PK"],
             "uuid": row["ZIDENTIFIER"],
             "title": row["ZTITLE1"],
-            "folder": get_folder_name(db, row["ZFOLDER"]),
+            "folder": folder_info.get("name"),
+            "folder_path": folder_info.get("path"),
             "created": coredata_to_iso(row["ZCREATIONDATE3"]),
             "modified": coredata_to_iso(row["ZMODIFICATIONDATE1"]),
             "pinned": bool(row["ZISPINNED"]),
@@ -326,27 +1003,38 @@ def read_note(identifier, fmt):
 
     row = db.execute(
         """SELECT n.Z_PK, n.ZIDENTIFIER, n.ZTITLE1, n.ZCREATIONDATE3,
-                  n.ZMODIFICATIONDATE1, n.ZFOLDER, n.ZISPINNED, n.ZMARKEDFORDELETION
-           FROM ZICCLOUDSYNCINGOBJECT n WHERE n.Z_PK = ?""",
+                  n.ZMODIFICATIONDATE1, n.ZFOLDER, n.ZISPINNED, n.ZMARKEDFORDELETION,
+                  nd.ZDATA
+           FROM ZICCLOUDSYNCINGOBJECT n
+           LEFT JOIN ZICNOTEDATA nd ON nd.Z_PK = n.ZNOTEDATA
+           WHERE n.Z_PK = ?""",
         (pk,),
     ).fetchone()
-
-    body = get_note_body(db, pk)
+    folder_name = get_folder_name(db, row["ZFOLDER"])
     db.close()
 
+    # Attribute runs are only decoded for the formats that render them
+    if fmt in ("markdown", "html"):
+        document = decode_note(row["ZDATA"])
+        body = document["text"]
+    else:
+        body = extract_text_from_protobuf(row["ZDATA"])
+
     if fmt == "text":
         print(body)
     elif fmt == "markdown":
-        # Simple text-to-markdown: just output as-is since extracted text is plain
-        print(body)
+        print(paragraphs_to_markdown(note_paragraphs(document["runs"])) if document["runs"] else body)
     elif fmt == "html":
-        print(f"<h1>{row['ZTITLE1'] or ''}</h1>\n<p>{body}</p>")
+        if document["runs"]:
+            print(paragraphs_to_html(note_paragraphs(document["runs"])))
+        else:
+            print(f"<h1>{_html_escape(row['ZTITLE1'] or '')}</h1>\n<p>{_html_escape(body)}</p>")
     else:
         note = {
             "id": row["Z_PK"],
             "uuid": row["ZIDENTIFIER"],
             "title": row["ZTITLE1"],
-            "folder": get_folder_name(get_db(), row["ZFOLDER"]),
+            "folder": folder_name,
             "created": coredata_to_iso(row["ZCREATIONDATE3"]),
             "modified": coredata_to_iso(row["ZMODIFICATIONDATE1"]),
             "pinned": bool(row["ZISPINNED"]),
@@ -359,10 +1047,13 @@ def read_note(identifier, fmt):
 @cli.command("search")
 @click.argument("query")
 @click.option("--folder", default=None, help="Filter by folder name")
+@click.option("--folder-path", default=None, help="Filter by folder path, e.g. Work/Projects")
+@click.option("--recursive", is_flag=True, help="Include notes in subfolders of the filtered folder")
 @click.option("--include-deleted", is_flag=True, help="Include deleted notes")
-def search_notes(query, folder, include_deleted):
+def search_notes(query, folder, folder_path, recursive, include_deleted):
     """Search notes by text content."""
     db = get_db()
+    index = get_folder_index(db)
 
     sql = """
         SELECT n.Z_PK, n.ZIDENTIFIER, n.ZTITLE1, n.ZCREATIONDATE3,
@@ -377,11 +1068,11 @@ def search_notes(query, folder, include_deleted):
     if not include_deleted:
         sql += " AND (n.ZMARKEDFORDELETION = 0 OR n.ZMARKEDFORDELETION IS NULL)"
 
-    if folder:
-        sql += """ AND n.ZFOLDER IN (
-            SELECT Z_PK FROM ZICCLOUDSYNCINGOBJECT WHERE ZTITLE2 = ?
-        )"""
-        params.append(folder)
+    clause, folder_params = folder_clause(
+        resolve_folder_filter(index, folder, folder_path, recursive)
+    )
+    sql += clause
+    params.extend(folder_params)
 
     sql += " ORDER BY n.ZMODIFICATIONDATE1 DESC"
 
@@ -409,11 +1100,13 @@ def search_notes(query, folder, include_deleted):
             elif query_lower in title.lower():
                 snippet = body[:100].replace("\n", " ") if body else ""
 
+            folder_info = index.get(row["ZFOLDER"], {})
             results.append({
                 "id": row["Z_PK"],
                 "uuid": row["ZIDENTIFIER"],
                 "title": title,
-                "folder": get_folder_name(db, row["ZFOLDER"]),
+                "folder": folder_info.get("name"),
+                "folder_path": folder_info.get("path"),
                 "modified": coredata_to_iso(row["ZMODIFICATIONDATE1"]),
                 "snippet": snippet,
             })
@@ -424,24 +1117,9 @@ def search_notes(query, folder, include_deleted):
 
 @cli.command("folders")
 def list_folders():
-    """List all folders."""
+    """List all folders with their path and note counts."""
     db = get_db()
-    rows = db.execute(
-        """SELECT Z_PK, ZIDENTIFIER, ZTITLE2, ZPARENT
-           FROM ZICCLOUDSYNCINGOBJECT
-           WHERE ZTITLE2 IS NOT NULL
-           ORDER BY ZTITLE2"""
-    ).fetchall()
-
-    folders = []
-    for row in rows:
-        folders.append({
-            "id": row["Z_PK"],
-            "uuid": row["ZIDENTIFIER"],
-            "name": row["ZTITLE2"],
-            "parent_id": row["ZPARENT"],
-        })
-
+    folders = list(get_folder_index(db).values())
     db.close()
     print(json.dumps(folders, indent=2))
 
@@ -539,46 +1217,351 @@ def show_checklists(identifier):
     db = get_db()
     pk = resolve_note_id(db, identifier)
 
-    # Note body contains checklist data in the protobuf. We also check for
-    # checklist records in the database.
-    body = get_note_body(db, pk)
+    # Checklist items are paragraphs whose ParagraphStyle carries a Checklist
+    # (uuid + done), so they come straight from the decoded attribute runs.
+    document = get_note_document(db, pk)
+    db.close()
+
+    items = note_checklists(note_paragraphs(document["runs"]))
+    print(json.dumps({"note_id": pk, "items": items}, indent=2))
+
 
-    # Check for checklist items in the ZICCLOUDSYNCINGOBJECT table
+@cli.command("duplicates")
+@click.option("--threshold", default=0.8, type=click.FloatRange(0.0, 1.0),
+              help="Minimum estimated Jaccard similarity (default: 0.8)")
+@click.option("--include-deleted", is_flag=True, help="Include deleted notes")
+@click.option("--rebuild", is_flag=True, help="Ignore persisted signatures and re-hash every note")
+def find_duplicates(threshold, include_deleted, rebuild):
+    """Find clusters of near-duplicate notes using MinHash + LSH."""
+    try:
+        import numpy as np
+    except ImportError:
+        error_exit("The duplicates command requires numpy: pip install numpy")
+
+    db = get_db()
     rows = db.execute(
-        """SELECT Z_PK, ZIDENTIFIER, ZTITLE1, ZISPASSWORDPROTECTED
-           FROM ZICCLOUDSYNCINGOBJECT
-           WHERE ZNOTE = ? AND ZTYPEUTI = 'com.apple.notes.inlinetextattachment.checklist'
-           ORDER BY Z_PK""",
-        (pk,),
+        """SELECT n.Z_PK, n.ZIDENTIFIER, n.ZTITLE1, n.ZMODIFICATIONDATE1, n.ZFOLDER,
+                  n.ZMARKEDFORDELETION
+           FROM ZICCLOUDSYNCINGOBJECT n
+           WHERE n.ZTITLE1 IS NOT NULL"""
     ).fetchall()
 
-    if rows:
-        items = []
-        for row in rows:
-            items.append({
+    cache = {} if rebuild else load_signature_cache(np)
+    # Drop signatures of notes that no longer exist
+    modified = {row["Z_PK"]: float(row["ZMODIFICATIONDATE1"] or 0) for row in rows}
+    cache = {pk: entry for pk, entry in cache.items() if pk in modified}
+
+    if not include_deleted:
+        rows = [row for row in rows if not row["ZMARKEDFORDELETION"]]
+    stale = [row["Z_PK"] for row in rows
+             if row["Z_PK"] not in cache or cache[row["Z_PK"]][0] != modified[row["Z_PK"]]]
+
+    # Only modified notes are fetched and decompressed
+    empty_sig = np.full(MINHASH_NUM_PERM, MINHASH_PRIME, dtype=np.uint32)
+    hashed_pks, shingle_sets = [], []
+    for i in range(0, len(stale), 500):
+        chunk = stale[i : i + 500]
+        data_rows = db.execute(
+            f"""SELECT n.Z_PK, nd.ZDATA FROM ZICCLOUDSYNCINGOBJECT n
+                LEFT JOIN ZICNOTEDATA nd ON nd.Z_PK = n.ZNOTEDATA
+                WHERE n.Z_PK IN ({",".join("?" * len(chunk))})""",
+            chunk,
+        ).fetchall()
+        for data_row in data_rows:
+            shingles = shingle_hashes(extract_text_from_protobuf(data_row["ZDATA"]))
+            if shingles:
+                hashed_pks.append(data_row["Z_PK"])
+                shingle_sets.append(shingles)
+            else:
+                cache[data_row["Z_PK"]] = (modified[data_row["Z_PK"]], empty_sig)
+
+    if shingle_sets:
+        for pk, sig in zip(hashed_pks, minhash_signatures(np, shingle_sets)):
+            cache[pk] = (modified[pk], sig)
+    if stale or rebuild:
+        try:
+            save_signature_cache(np, cache)
+        except OSError:
+            pass  # The cache is an optimization; results are still correct
+
+    # Notes without any text have no meaningful signature
+    candidates = [row for row in rows if not np.array_equal(cache[row["Z_PK"]][1], empty_sig)]
+    sigs = (
+        np.stack([cache[row["Z_PK"]][1] for row in candidates])
+        if candidates
+        else np.empty((0, MINHASH_NUM_PERM), dtype=np.uint32)
+    )
+
+    # LSH banding: notes sharing any identical band become candidate pairs
+    bands, band_rows = lsh_bands(threshold)
+    parent = list(range(len(candidates)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Notes with identical signatures (e.g. agent retries) are merged up front,
+    # so banding only ever compares distinct signatures.
+    if len(candidates) > 1:
+        _, first, inverse = np.unique(sigs, axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for i, group in enumerate(inverse):
+            if first[group] != i:
+                parent[i] = int(first[group])
+        distinct = np.sort(first)
+    else:
+        distinct = np.arange(len(candidates))
+
+    min_matches = threshold * MINHASH_NUM_PERM
+    for band in range(bands if len(distinct) > 1 else 0):
+        band_sigs = sigs[distinct, band * band_rows : (band + 1) * band_rows]
+        _, bucket_ids = np.unique(band_sigs, axis=0, return_inverse=True)
+        bucket_ids = bucket_ids.reshape(-1)
+        order = np.argsort(bucket_ids, kind="stable")
+        splits = np.flatnonzero(np.diff(bucket_ids[order])) + 1
+        for bucket in np.split(order, splits):
+            if len(bucket) < 2:
+                continue
+            # Each member is compared against one representative per cluster
+            # already seen in this bucket, so a bucket costs O(k * clusters).
+            reps = {}  # cluster root -> representative member
+            for b in bucket:
+                j = int(distinct[b])
+                if find(j) in reps:
+                    continue
+                if reps:
+                    roots = list(reps)
+                    matches = np.count_nonzero(
+                        sigs[[reps[r] for r in roots]] == sigs[j], axis=1
+                    ) >= min_matches
+                    for root, matched in zip(roots, matches):
+                        if matched:
+                            del reps[root]
+                            parent[find(root)] = find(j)
+                reps[find(j)] = j
+
+    groups = {}
+    for i in range(len(candidates)):
+        groups.setdefault(find(i), []).append(i)
+
+    index = get_folder_index(db)
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda m: -(candidates[m]["ZMODIFICATIONDATE1"] or 0))
+        # Similarity is measured against the newest note rather than every pair
+        similarity = (sigs[members] == sigs[members[0]]).mean(axis=1)
+        notes = []
+        for i in members:
+            row = candidates[i]
+            notes.append({
                 "id": row["Z_PK"],
                 "uuid": row["ZIDENTIFIER"],
-                "text": row["ZTITLE1"],
+                "title": row["ZTITLE1"],
+                "folder": index.get(row["ZFOLDER"], {}).get("name"),
+                "modified": coredata_to_iso(row["ZMODIFICATIONDATE1"]),
+                "deleted": bool(row["ZMARKEDFORDELETION"]),
             })
-        db.close()
-        print(json.dumps(items, indent=2))
-        return
+        clusters.append({
+            "size": len(notes),
+            "min_similarity": round(float(similarity[1:].min()), 3),
+            "notes": notes,
+        })
 
-    # Fallback: try to extract checklist-like content from the note body
-    # Look for lines that might be checklist items
-    lines = body.split("\n")
-    items = []
-    for line in lines:
-        stripped = line.strip()
-        if stripped:
-            items.append({"text": stripped, "source": "body_text"})
+    db.close()
+    clusters.sort(key=lambda c: (-c["size"], -c["min_similarity"]))
+    print(json.dumps({
+        "threshold": threshold,
+        "notes_scanned": len(rows),
+        "notes_rehashed": len(stale),
+        "clusters": clusters,
+    }, indent=2))
+
+
+@cli.command("stats")
+@click.option("--sample", default=50, type=click.IntRange(0),
+              help="Notes to decode for text/timing estimates (0 to skip, default: 50)")
+@click.option("--top", default=10, type=click.IntRange(0), help="Number of largest notes to list")
+def store_stats(sample, top):
+    """Report store-level size, attachment and search-cost metrics as JSON."""
+    db = get_db()
+    active = "(n.ZMARKEDFORDELETION = 0 OR n.ZMARKEDFORDELETION IS NULL)"
+
+    counts = db.execute(
+        f"""SELECT
+              SUM(n.ZTITLE1 IS NOT NULL AND {active}) AS notes,
+              SUM(n.ZTITLE1 IS NOT NULL AND NOT {active}) AS deleted_notes,
+              SUM(n.ZTITLE2 IS NOT NULL) AS folders,
+              SUM(n.ZTYPEUTI IS NOT NULL AND n.ZNOTE IS NOT NULL) AS attachments
+           FROM ZICCLOUDSYNCINGOBJECT n"""
+    ).fetchone()
+
+    # Compressed ZDATA sizes: summary, nearest-rank percentiles and a histogram
+    sized = f"""
+        SELECT n.Z_PK, n.ZTITLE1, {active} AS active, LENGTH(nd.ZDATA) AS size
+        FROM ZICCLOUDSYNCINGOBJECT n
+        JOIN ZICNOTEDATA nd ON nd.Z_PK = n.ZNOTEDATA
+        WHERE n.ZTITLE1 IS NOT NULL AND nd.ZDATA IS NOT NULL
+    """
+    dist = db.execute(
+        f"""WITH ranked AS (
+              SELECT size, ROW_NUMBER() OVER (ORDER BY size) AS rn, COUNT(*) OVER () AS cnt
+              FROM ({sized})
+           )
+           SELECT COUNT(*) AS count, COALESCE(SUM(size), 0) AS total, MIN(size) AS min,
+                  MAX(size) AS max, AVG(size) AS mean,
+                  MAX(CASE WHEN rn <= (cnt * 50 + 99) / 100 THEN size END) AS p50,
+                  MAX(CASE WHEN rn <= (cnt * 90 + 99) / 100 THEN size END) AS p90,
+                  MAX(CASE WHEN rn <= (cnt * 99 + 99) / 100 THEN size END) AS p99
+           FROM ranked"""
+    ).fetchone()
+    histogram = db.execute(
+        f"""SELECT CASE
+                 WHEN size < 1024 THEN '<1KB'
+                 WHEN size < 4096 THEN '1-4KB'
+                 WHEN size < 16384 THEN '4-16KB'
+                 WHEN size < 65536 THEN '16-64KB'
+                 WHEN size < 262144 THEN '64-256KB'
+                 WHEN size < 1048576 THEN '256KB-1MB'
+                 ELSE '>=1MB'
+               END AS bucket, COUNT(*) AS count, SUM(size) AS bytes
+           FROM ({sized})
+           GROUP BY bucket ORDER BY MIN(size)"""
+    ).fetchall()
+
+    # Decompressed size comes from the gzip trailer, so nothing is inflated here
+    decompressed = {}
+    gzip_compressed = 0  # ZDATA bytes of the blobs that have a gzip trailer
+    search_compressed = search_decompressed = search_notes_count = 0
+    for row in db.execute(
+        f"""SELECT n.Z_PK, {active} AS active, LENGTH(nd.ZDATA) AS size,
+                  substr(nd.ZDATA, 1, 2) AS magic, substr(nd.ZDATA, -4) AS trailer
+           FROM ZICCLOUDSYNCINGOBJECT n
+           JOIN ZICNOTEDATA nd ON nd.Z_PK = n.ZNOTEDATA
+           WHERE n.ZTITLE1 IS NOT NULL AND nd.ZDATA IS NOT NULL"""
+    ):
+        isize = gzip_isize(row["magic"], row["trailer"])
+        if isize is not None:
+            decompressed[row["Z_PK"]] = isize
+            gzip_compressed += row["size"]
+        if row["active"]:
+            # search (without --include-deleted) inflates every one of these
+            search_notes_count += 1
+            search_compressed += row["size"]
+            search_decompressed += isize or 0
+    total_decompressed = sum(decompressed.values())
+
+    largest = []
+    for row in db.execute(f"SELECT * FROM ({sized}) ORDER BY size DESC LIMIT ?", (top,)):
+        largest.append({
+            "id": row["Z_PK"],
+            "title": row["ZTITLE1"],
+            "compressed_bytes": row["size"],
+            "decompressed_bytes": decompressed.get(row["Z_PK"]),
+            "deleted": not row["active"],
+        })
+
+    columns = table_columns(db, "ZICCLOUDSYNCINGOBJECT")
+    size_sources = []
+    if "ZMEDIA" in columns and "ZFILESIZE" in columns:
+        size_sources.append("m.ZFILESIZE")
+    if "ZFILESIZE" in columns:
+        size_sources.append("a.ZFILESIZE")
+    size_expr = f"SUM(COALESCE({', '.join(size_sources)}, 0))" if size_sources else "NULL"
+    media_join = (
+        "LEFT JOIN ZICCLOUDSYNCINGOBJECT m ON m.Z_PK = a.ZMEDIA" if "ZMEDIA" in columns else ""
+    )
+    attachments = [
+        {"type": row["ZTYPEUTI"], "count": row["count"], "bytes": row["bytes"]}
+        for row in db.execute(
+            f"""SELECT a.ZTYPEUTI, COUNT(*) AS count, {size_expr} AS bytes
+                FROM ZICCLOUDSYNCINGOBJECT a {media_join}
+                WHERE a.ZTYPEUTI IS NOT NULL AND a.ZNOTE IS NOT NULL
+                GROUP BY a.ZTYPEUTI
+                ORDER BY bytes DESC, count DESC"""
+        )
+    ]
+
+    # Optional sampled decode pass: text yield and extraction throughput
+    # Drawn from the same titled notes as the totals it is scaled against
+    sampled = None
+    elapsed = 0.0
+    if sample and dist["count"]:
+        rows = db.execute(
+            """SELECT nd.ZDATA FROM ZICNOTEDATA nd
+               WHERE nd.Z_PK IN (
+                   SELECT nd.Z_PK FROM ZICCLOUDSYNCINGOBJECT n
+                   JOIN ZICNOTEDATA nd ON nd.Z_PK = n.ZNOTEDATA
+                   WHERE n.ZTITLE1 IS NOT NULL AND nd.ZDATA IS NOT NULL
+                   ORDER BY RANDOM() LIMIT ?
+               )""",
+            (sample,),
+        ).fetchall()
+        sample_bytes = sample_text = 0
+        started = time.perf_counter()
+        for row in rows:
+            sample_bytes += len(row["ZDATA"])
+            sample_text += len(extract_text_from_protobuf(row["ZDATA"]).encode("utf-8"))
+        elapsed = time.perf_counter() - started
+        sampled = {
+            "notes": len(rows),
+            "compressed_bytes": sample_bytes,
+            "text_bytes": sample_text,
+            "seconds": round(elapsed, 6),
+        }
 
     db.close()
 
-    if items:
-        print(json.dumps({"note_id": pk, "items": items, "note": "Extracted from note body text"}, indent=2))
-    else:
-        print(json.dumps({"note_id": pk, "items": [], "note": "No checklist items found"}, indent=2))
+    search_cost = {
+        "notes": search_notes_count,
+        "compressed_bytes": search_compressed,
+        "decompressed_bytes": search_decompressed,
+        "estimated_seconds": None,
+    }
+    if sampled and sampled["compressed_bytes"]:
+        # Extrapolate from the unrounded timing; only the output is rounded
+        search_cost["estimated_seconds"] = round(
+            elapsed * search_compressed / sampled["compressed_bytes"], 6
+        )
+
+    stats = {
+        "counts": {
+            "notes": counts["notes"] or 0,
+            "deleted_notes": counts["deleted_notes"] or 0,
+            "folders": counts["folders"] or 0,
+            "attachments": counts["attachments"] or 0,
+        },
+        "note_data": {
+            "count": dist["count"],
+            "compressed_bytes": {
+                "total": dist["total"],
+                "min": dist["min"],
+                "max": dist["max"],
+                "mean": round(dist["mean"], 1) if dist["mean"] is not None else None,
+                "p50": dist["p50"],
+                "p90": dist["p90"],
+                "p99": dist["p99"],
+            },
+            "histogram": [
+                {"bucket": row["bucket"], "count": row["count"], "bytes": row["bytes"]}
+                for row in histogram
+            ],
+            "decompressed_bytes": total_decompressed,
+            # Both sides cover only gzip blobs; others have no recorded size
+            "blobs_without_isize": dist["count"] - len(decompressed),
+            "compression_ratio": (
+                round(total_decompressed / gzip_compressed, 2) if gzip_compressed else None
+            ),
+        },
+        "largest_notes": largest,
+        "attachments_by_type": attachments,
+        "search_cost": search_cost,
+        "sample": sampled,
+    }
+    print(json.dumps(stats, indent=2))
 
 
 # ── WRITE COMMANDS ───────────────────────────────────────────────────────